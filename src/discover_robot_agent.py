@@ -1,32 +1,181 @@
 """Discover robot agents registered on ERC-8004 (Ethereum Sepolia).
 
-Filters by on-chain metadata: category=robot (ERC-8004 reserved key).
-Read-only — no wallet or signer needed.
+Filters by metadata category=robot (ERC-8004 reserved key), matched by the
+subgraph at search time. Read-only — no wallet or signer needed.
 """
 
+import asyncio
+import os
 import sys
-import requests
-from agent0_sdk import SDK
+from dataclasses import dataclass
+from pathlib import Path
+import httpx
+import orjson
+from dotenv import load_dotenv
+from ipfs_car import CAR_ACCEPT, extract_file, is_verifiable
+from registry_reader import BATCH_SIZE, get_indexed_metadata, read_registry, use_shared_session
 
-sdk = SDK(
-    chainId=11155111,
-    rpcUrl="https://ethereum-sepolia-rpc.publicnode.com",
-)
+RPC_URL = "https://ethereum-sepolia-rpc.publicnode.com"
 
-IPFS_GATEWAY = "https://ipfs.io/ipfs/"
+# Public gateways raced against each other; the first valid (CID-verified) response wins
+IPFS_GATEWAYS = [
+    "https://ipfs.io/ipfs/",
+    "https://dweb.link/ipfs/",
+    "https://w3s.link/ipfs/",
+]
 
+# Joins the race when the user has pinned content on Pinata (PINATA_JWT set)
+PINATA_GATEWAY = "https://gateway.pinata.cloud/ipfs/"
 
-def fetch_ipfs_tools(agent_id_int: int) -> list:
+# Packed JSON profile ({"type", "provider", "domain"}) read for every robot agent
+# (category is already matched by the search)
+PROFILE_KEY = "robot_profile"
+
+# Separate keys written by earlier registrations; read only when robot_profile is unset
+LEGACY_KEYS = ("robot_type", "fleet_provider", "fleet_domain")
+
+# Agents per multicall (worst case: profile + legacy keys + tokenURI), so each batch stays within BATCH_SIZE calls
+AGENTS_PER_BATCH = BATCH_SIZE // (len(LEGACY_KEYS) + 2)
+
+# Max in-flight RPC/IPFS requests (avoid hammering the public RPC node)
+MAX_CONCURRENCY = 8
+
+
+@dataclass
+class RobotAgent:
+    agent_id: str
+    name: str
+    robot_type: str
+    fleet_provider: str
+    fleet_domain: str
+    tools: list
+
+
+def decode_document(cid: str, raw: bytes) -> dict:
+    """Decode a gateway response: a CAR checked against the CID, or plain JSON for unverifiable CIDs."""
+    return orjson.loads(extract_file(raw, cid) if is_verifiable(cid) else raw)
+
+
+async def _fetch_from_gateway(
+    client: httpx.AsyncClient, gateway: str, cid: str, headers: dict | None = None, **kwargs
+) -> tuple:
+    """Return (document, raw response); raises if the response is invalid or fails verification."""
+    headers = dict(headers or {})
+    params = {}
+    if is_verifiable(cid):
+        # Trustless retrieval: ask for the raw blocks and hash them locally
+        params["format"] = "car"
+        headers["Accept"] = CAR_ACCEPT
+    resp = await client.get(f"{gateway}{cid}", params=params, headers=headers, **kwargs)
+    resp.raise_for_status()
+    return decode_document(cid, resp.content), resp.content
+
+
+def preferred_gateway() -> tuple:
+    """Return (gateway URL or None, request headers) for the user's own gateway.
+
+    IPFS_GATEWAY selects a local node (http://127.0.0.1:8080/ipfs/) or a dedicated
+    gateway; PINATA_GATEWAY_TOKEN is sent to Pinata dedicated gateways. With only
+    PINATA_JWT set, Pinata's gateway is used since that account pinned the files.
+    """
+    gateway = os.getenv("IPFS_GATEWAY") or (PINATA_GATEWAY if os.getenv("PINATA_JWT") else None)
+    token = os.getenv("PINATA_GATEWAY_TOKEN")
+    headers = {"x-pinata-gateway-token": token} if gateway and token else {}
+    return gateway, headers
+
+
+def ipfs_client() -> httpx.AsyncClient:
+    """Keep-alive client shared by all gateway requests in one discovery run."""
+    transport = httpx.AsyncHTTPTransport(
+        retries=2,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+    )
+    return httpx.AsyncClient(transport=transport, timeout=10.0, follow_redirects=True)
+
+
+def ipfs_cache_dir() -> Path:
+    """Directory for cached registration files ($XDG_CACHE_HOME/tumbller/ipfs).
+
+    Only CAR-verified files are cached; each is stored as the CAR and re-checked
+    against the CID on every read. Unverified (plain JSON) responses are never
+    cached, since nothing ties them to the CID. Resolved per call so an
+    XDG_CACHE_HOME set in .env (loaded in main) is honoured.
+    """
+    return Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache") / "tumbller" / "ipfs"
+
+
+def _cache_path(cid: str) -> Path:
+    return ipfs_cache_dir() / f"{cid}.car"
+
+
+def read_cached(cid: str) -> dict | None:
+    if not is_verifiable(cid):
+        return None
+    try:
+        return decode_document(cid, _cache_path(cid).read_bytes())
+    except (OSError, ValueError):
+        return None
+
+
+def write_cached(cid: str, raw: bytes) -> None:
+    if not is_verifiable(cid):
+        return
+    path = _cache_path(cid)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(raw)
+        tmp.replace(path)
+    except OSError:
+        pass
+
+
+async def fetch_ipfs_json(client: httpx.AsyncClient, cid: str) -> dict | None:
+    """Return the JSON document for a CID: local cache, then the gateway race."""
+    cached = read_cached(cid)
+    if cached is not None:
+        return cached
+    result = await race_gateways(client, cid)
+    if result is None:
+        return None
+    data, raw = result
+    write_cached(cid, raw)
+    return data
+
+
+async def race_gateways(client: httpx.AsyncClient, cid: str) -> tuple | None:
+    """Race all gateways for a CID; return (document, raw response) from the first valid one.
+
+    The preferred gateway races alongside the public ones, so a slow or
+    unreachable one never delays discovery.
+    """
+    racers = [(gw, {}) for gw in IPFS_GATEWAYS]
+    gateway, headers = preferred_gateway()
+    if gateway and gateway not in IPFS_GATEWAYS:
+        racers.insert(0, (gateway, headers))
+    tasks = [asyncio.create_task(_fetch_from_gateway(client, gw, cid, headers=hdrs)) for gw, hdrs in racers]
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        # Collect every task (losers included) so no exception goes unretrieved
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return None
+
+
+async def fetch_ipfs_tools(client: httpx.AsyncClient, uri: str) -> list:
     """Fetch MCP tools directly from IPFS (bypasses subgraph indexing delays)."""
+    if not uri or not uri.startswith("ipfs://"):
+        return []
     try:
-        uri = sdk.identity_registry.functions.tokenURI(agent_id_int).call()
-        if not uri or not uri.startswith("ipfs://"):
-            return []
-        cid = uri.replace("ipfs://", "")
-        resp = requests.get(f"{IPFS_GATEWAY}{cid}", timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        for svc in data.get("services", []):
+        data = await fetch_ipfs_json(client, uri.replace("ipfs://", ""))
+        for svc in (data or {}).get("services", []):
             if svc.get("name") == "MCP":
                 return svc.get("mcpTools", [])
     except Exception:
@@ -34,44 +183,128 @@ def fetch_ipfs_tools(agent_id_int: int) -> list:
     return []
 
 
-print("Searching for robot agents on Ethereum Sepolia...\n")
-results = sdk.searchAgents(hasMetadataKey="category")
-
-found = False
-for agent in results:
+def parse_agent_id(agent) -> tuple:
+    """Return (agentId string, on-chain token id) for a search result."""
     agent_id_str = agent.get("agentId") if isinstance(agent, dict) else agent.agentId
-    agent_id_int = int(str(agent_id_str).split(":")[-1])
+    return agent_id_str, int(str(agent_id_str).split(":")[-1])
+
+
+def parse_profile(value: bytes) -> dict:
+    """Decode a robot_profile metadata value; empty or malformed values give {}."""
+    try:
+        profile = orjson.loads(value) if value else {}
+    except ValueError:
+        return {}
+    return profile if isinstance(profile, dict) else {}
 
-    # Verify category=robot on-chain (ERC-8004 reserved key)
-    meta = sdk.identity_registry.functions.getMetadata(agent_id_int, "category").call()
-    if meta != b"robot":
-        continue
 
-    found = True
-    robot_type = sdk.identity_registry.functions.getMetadata(agent_id_int, "robot_type").call()
-    provider = sdk.identity_registry.functions.getMetadata(agent_id_int, "fleet_provider").call()
-    fleet = sdk.identity_registry.functions.getMetadata(agent_id_int, "fleet_domain").call()
+def subgraph_tools(agent) -> list:
+    """MCP tools as indexed by the subgraph (may lag behind IPFS)."""
+    return (agent.get("mcpTools") if isinstance(agent, dict) else agent.mcpTools) or []
 
+
+async def probe_agent(agent, metadata: dict, uris: dict, client: httpx.AsyncClient, sem: asyncio.Semaphore) -> RobotAgent:
+    """Build a RobotAgent from a search result."""
+    agent_id_str, agent_id_int = parse_agent_id(agent)
     name = agent.get("name") if isinstance(agent, dict) else agent.name
 
     # Get tools from subgraph first, fall back to direct IPFS fetch
-    tools = agent.get("mcpTools", []) if isinstance(agent, dict) else agent.mcpTools
+    tools = subgraph_tools(agent)
     if not tools:
-        tools = fetch_ipfs_tools(agent_id_int)
-
-    print(f"  {name} (ID: {agent_id_str})")
-    print(f"    robot_type:     {robot_type.decode() if robot_type else 'unknown'}")
-    print(f"    fleet_provider: {provider.decode() if provider else 'none'}")
-    print(f"    fleet_domain:   {fleet.decode() if fleet else 'none'}")
-    print(f"    MCP tools:      {tools}")
-    print()
-
-if not found:
-    print("  No robot agents found.")
-
-# If an agent ID is passed as argument, fetch details
-if len(sys.argv) > 1:
-    agent_id = sys.argv[1]
-    print(f"\nFetching agent {agent_id}...")
-    summary = sdk.getAgent(f"11155111:{agent_id}")
-    print(summary)
+        async with sem:
+            tools = await fetch_ipfs_tools(client, uris.get(agent_id_int, ""))
+
+    profile = parse_profile(metadata.get((agent_id_int, PROFILE_KEY), b""))
+    legacy = {key: metadata.get((agent_id_int, key), b"").decode() for key in LEGACY_KEYS}
+    return RobotAgent(
+        agent_id=agent_id_str,
+        name=name,
+        robot_type=profile.get("type") or legacy["robot_type"],
+        fleet_provider=profile.get("provider") or legacy["fleet_provider"],
+        fleet_domain=profile.get("domain") or legacy["fleet_domain"],
+        tools=tools,
+    )
+
+
+def read_metadata(sdk, agents: list) -> tuple:
+    """Metadata and tokenURIs for a chunk of agents.
+
+    Subgraph values are used where indexed. Unindexed robot_profile values
+    and the tokenURI of every agent without subgraph tools go into one
+    multicall; legacy keys are only read for agents with no robot_profile.
+    """
+    ids = [parse_agent_id(agent) for agent in agents]
+    try:
+        metadata = get_indexed_metadata(sdk, [agent_id_str for agent_id_str, _ in ids], (PROFILE_KEY, *LEGACY_KEYS))
+    except Exception:
+        metadata = {}
+    missing = [(agent_id_int, PROFILE_KEY) for _, agent_id_int in ids if (agent_id_int, PROFILE_KEY) not in metadata]
+    need_uri = [agent_id_int for agent, (_, agent_id_int) in zip(agents, ids) if not subgraph_tools(agent)]
+    onchain, uris = read_registry(sdk, missing, need_uri)
+    metadata.update(onchain)
+
+    legacy = [
+        (agent_id_int, key)
+        for _, agent_id_int in ids
+        if not metadata.get((agent_id_int, PROFILE_KEY))
+        for key in LEGACY_KEYS
+        if (agent_id_int, key) not in metadata
+    ]
+    if legacy:
+        metadata.update(read_registry(sdk, legacy)[0])
+    return metadata, uris
+
+
+async def probe_agents(sdk, agents: list, client: httpx.AsyncClient, sem: asyncio.Semaphore) -> list:
+    """Read metadata for a chunk of agents, then probe each agent."""
+    async with sem:
+        metadata, uris = await asyncio.to_thread(read_metadata, sdk, agents)
+    return await asyncio.gather(*(probe_agent(agent, metadata, uris, client, sem) for agent in agents))
+
+
+async def discover(sdk, results: list) -> list:
+    """Probe all search results concurrently, one multicall per chunk of agents."""
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    chunks = [results[i:i + AGENTS_PER_BATCH] for i in range(0, len(results), AGENTS_PER_BATCH)]
+    async with ipfs_client() as client:
+        probed = await asyncio.gather(*(probe_agents(sdk, chunk, client, sem) for chunk in chunks))
+    return [robot for chunk in probed for robot in chunk]
+
+
+def main():
+    from agent0_sdk import SDK
+
+    load_dotenv()
+
+    sdk = SDK(
+        chainId=11155111,
+        rpcUrl=RPC_URL,
+    )
+    use_shared_session(sdk)
+
+    print("Searching for robot agents on Ethereum Sepolia...\n")
+    # category=robot is matched in the subgraph, so every result is a robot agent
+    results = sdk.searchAgents(metadataValue={"key": "category", "value": "robot"})
+    robots = asyncio.run(discover(sdk, results))
+
+    for robot in robots:
+        print(f"  {robot.name} (ID: {robot.agent_id})")
+        print(f"    robot_type:     {robot.robot_type or 'unknown'}")
+        print(f"    fleet_provider: {robot.fleet_provider or 'none'}")
+        print(f"    fleet_domain:   {robot.fleet_domain or 'none'}")
+        print(f"    MCP tools:      {robot.tools}")
+        print()
+
+    if not robots:
+        print("  No robot agents found.")
+
+    # If an agent ID is passed as argument, fetch details
+    if len(sys.argv) > 1:
+        agent_id = sys.argv[1]
+        print(f"\nFetching agent {agent_id}...")
+        summary = sdk.getAgent(f"11155111:{agent_id}")
+        print(summary)
+
+
+if __name__ == "__main__":
+    main()
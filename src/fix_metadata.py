@@ -1,4 +1,9 @@
-"""Fix on-chain metadata: set category=robot and clear old agent_type key.
+"""Fix on-chain metadata: set category=robot and clear superseded keys.
+
+Clears the old agent_type key and the robot_type / fleet_provider /
+fleet_domain keys that robot_profile replaced. The latter are only cleared
+once robot_profile is set on-chain (run update_agent.py first), so the
+robot's profile is never lost.
 
 One-time migration script. Safe to run multiple times.
 """
@@ -6,6 +11,7 @@ One-time migration script. Safe to run multiple times.
 import os
 from dotenv import load_dotenv
 from agent0_sdk import SDK
+from registry_reader import get_metadata_batch, use_shared_session
 
 load_dotenv()
 
@@ -14,41 +20,88 @@ sdk = SDK(
     rpcUrl=os.environ["RPC_URL"],
     signer=os.environ["SIGNER_PVT_KEY"],
 )
+use_shared_session(sdk)
 
 AGENT_ID_INT = 989
 
-# Read current values
-old_key = sdk.identity_registry.functions.getMetadata(AGENT_ID_INT, "agent_type").call()
-new_key = sdk.identity_registry.functions.getMetadata(AGENT_ID_INT, "category").call()
+
+def eip1559_fees(w3, blocks: int = 10, percentile: int = 50) -> dict:
+    """EIP-1559 fee fields sized from recent blocks so the writes aren't underpriced.
+
+    maxFeePerGas leaves room for the base fee to double before inclusion.
+    """
+    history = w3.eth.fee_history(blocks, "latest", [percentile])
+    base_fee = history["baseFeePerGas"][-1]  # base fee of the next block
+    tips = sorted(reward[0] for reward in history["reward"] if reward)
+    tip = max(tips[len(tips) // 2] if tips else 0, w3.to_wei(1, "gwei"))
+    return {"maxPriorityFeePerGas": tip, "maxFeePerGas": 2 * base_fee + tip}
+
+
+# Keys superseded by category (agent_type) and by robot_profile (the rest)
+OLD_KEYS = ("agent_type", "robot_type", "fleet_provider", "fleet_domain")
+PROFILE_KEYS = OLD_KEYS[1:]
+KEYS = ("category", "robot_profile") + OLD_KEYS
+
+# Read current values (single multicall)
+current = get_metadata_batch(sdk, [AGENT_ID_INT], KEYS)
 print(f"Current on-chain metadata:")
-print(f"  agent_type = {old_key.decode() if old_key else '(empty)'}")
-print(f"  category   = {new_key.decode() if new_key else '(empty)'}")
-
-# Set category=robot
-if new_key != b"robot":
-    print("\nSetting category=robot...")
-    tx = sdk.web3_client.transact_contract(
-        sdk.identity_registry, "setMetadata", AGENT_ID_INT, "category", b"robot"
-    )
-    sdk.web3_client.wait_for_transaction(tx, timeout=60)
-    print(f"  Done (tx: {tx})")
+for key in KEYS:
+    value = current[(AGENT_ID_INT, key)]
+    print(f"  {key:<14} = {value.decode() if value else '(empty)'}")
+
+# Collect the writes that are actually needed
+writes = []
+if current[(AGENT_ID_INT, "category")] != b"robot":
+    writes.append(("category", b"robot", "Setting category=robot"))
 else:
     print("\n  category=robot already set, skipping.")
+has_profile = bool(current[(AGENT_ID_INT, "robot_profile")])
+for key in OLD_KEYS:
+    if not current[(AGENT_ID_INT, key)]:
+        print(f"  {key} already empty, skipping.")
+    elif key in PROFILE_KEYS and not has_profile:
+        print(f"  {key} kept: robot_profile is not set on-chain yet, run update_agent.py first.")
+    else:
+        writes.append((key, b"", f"Clearing {key}"))
 
-# Clear old agent_type key
-if old_key:
-    print("Clearing agent_type...")
-    tx = sdk.web3_client.transact_contract(
-        sdk.identity_registry, "setMetadata", AGENT_ID_INT, "agent_type", b""
+# The registry has no batched setter, so submit all writes back-to-back with
+# explicit consecutive nonces (no waiting for the node's pending count to catch
+# up) and wait for confirmations once. They usually land in the same block.
+txs = []
+if writes:
+    w3 = sdk.web3_client.w3
+    account = sdk.web3_client.account
+    # Read the starting nonce once; behind a load-balanced RPC a lagging backend
+    # can report a stale pending count, so never go below the mined count
+    nonce = max(
+        w3.eth.get_transaction_count(account.address, "pending"),
+        w3.eth.get_transaction_count(account.address, "latest"),
     )
-    sdk.web3_client.wait_for_transaction(tx, timeout=60)
-    print(f"  Done (tx: {tx})")
-else:
-    print("  agent_type already empty, skipping.")
+    fees = eip1559_fees(w3)
+    for i, (key, value, label) in enumerate(writes):
+        print(f"\n{label}...")
+        tx = sdk.identity_registry.functions.setMetadata(AGENT_ID_INT, key, value).build_transaction({
+            "from": account.address,
+            "nonce": nonce + i,
+            **fees,
+        })
+        signed = account.sign_transaction(tx)
+        tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction).hex()
+        print(f"  Submitted (tx: {tx_hash}, nonce: {nonce + i})")
+        txs.append(tx_hash)
+
+if txs:
+    print("\nWaiting for transactions to be mined...")
+    # Nonces are mined in order, so once the last receipt exists the
+    # earlier ones return immediately; checking them still catches reverts.
+    sdk.web3_client.wait_for_transaction(txs[-1], timeout=60)
+    for tx_hash in txs[:-1]:
+        sdk.web3_client.wait_for_transaction(tx_hash, timeout=60)
+    print("  Done")
 
 # Verify
-new_val = sdk.identity_registry.functions.getMetadata(AGENT_ID_INT, "category").call()
-old_val = sdk.identity_registry.functions.getMetadata(AGENT_ID_INT, "agent_type").call()
+verified = get_metadata_batch(sdk, [AGENT_ID_INT], KEYS)
 print(f"\nVerification:")
-print(f"  category   = {new_val.decode() if new_val else '(empty)'}")
-print(f"  agent_type = {old_val.decode() if old_val else '(empty)'}")
+for key in KEYS:
+    value = verified[(AGENT_ID_INT, key)]
+    print(f"  {key:<14} = {value.decode() if value else '(empty)'}")
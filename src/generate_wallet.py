@@ -7,53 +7,51 @@ Usage:
 
 import sys
 import os
-import re
-
-sys.path.insert(0, os.path.dirname(__file__))
-
 from dotenv import load_dotenv
-from web3 import Web3
 
 ENV_PATH = os.path.join(os.path.dirname(__file__), "..", ".env")
 
-load_dotenv(ENV_PATH)
 
-
-def update_env(key, value):
-    """Update or append a key=value in the .env file."""
+def update_env_bulk(pairs):
+    """Update or append several key=value pairs in the .env file (single read and write)."""
     env_path = os.path.abspath(ENV_PATH)
     with open(env_path, "r") as f:
-        content = f.read()
-
-    if re.search(rf"^{key}=.*$", content, re.MULTILINE):
-        content = re.sub(
-            rf"^{key}=.*$",
-            f"{key}={value}",
-            content,
-            flags=re.MULTILINE,
-        )
-    else:
-        content += f"\n{key}={value}\n"
+        lines = f.read().splitlines()
+
+    seen = set()
+    for i, line in enumerate(lines):
+        key, sep, _ = line.partition("=")
+        if sep and key in pairs:
+            lines[i] = f"{key}={pairs[key]}"
+            seen.add(key)
+
+    missing = [key for key in pairs if key not in seen]
+    if missing:
+        lines.append("")
+        lines.extend(f"{key}={pairs[key]}" for key in missing)
 
     with open(env_path, "w") as f:
-        f.write(content)
+        f.write("\n".join(lines) + "\n")
 
 
 def get_existing_wallet():
     key = os.getenv("SIGNER_PVT_KEY", "").strip()
     if not key:
         return None
-    w3 = Web3()
-    account = w3.eth.account.from_key(key)
-    return account
+    from eth_account import Account  # deferred: only needed when a key is present
+
+    return Account.from_key(key)
 
 
 def generate_and_save():
-    w3 = Web3()
-    account = w3.eth.account.create()
+    from eth_account import Account
+
+    account = Account.create()
 
-    update_env("SIGNER_PVT_KEY", account.key.hex())
-    update_env("WALLET_ADDRESS", account.address)
+    update_env_bulk({
+        "SIGNER_PVT_KEY": account.key.hex(),
+        "WALLET_ADDRESS": account.address,
+    })
 
     print("=== New Ethereum Wallet ===")
     print(f"Address: {account.address}")
@@ -63,7 +61,8 @@ def generate_and_save():
     return account
 
 
-if __name__ == "__main__":
+def main():
+    load_dotenv(ENV_PATH)
     if "--new" in sys.argv:
         generate_and_save()
     else:
@@ -74,3 +73,7 @@ if __name__ == "__main__":
         else:
             print("No wallet found in .env. Run with --new to generate one:")
             print("  uv run python src/generate_wallet.py --new")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Trustless IPFS retrieval from CAR (Content Addressable aRchive) responses.
+
+Gateways return the raw blocks behind a CID when asked for ?format=car.
+Every block used is hashed locally and checked against its CID, so the
+content can be trusted (and cached) no matter which gateway served it.
+
+Supports CIDv0 and CIDv1 (base32) with sha2-256, for raw blocks and
+dag-pb UnixFS files, which covers what Pinata and kubo produce for JSON
+files. Anything else is reported as not verifiable.
+"""
+
+import base64
+import hashlib
+
+CAR_ACCEPT = "application/vnd.ipld.car"
+
+RAW = 0x55
+DAG_PB = 0x70
+SHA2_256 = 0x12
+
+_B58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+# UnixFS Data.Type values that carry file bytes
+_UNIXFS_RAW = 0
+_UNIXFS_FILE = 2
+
+# Bounds for walking a file's DAG; registration files are a few KB, and the caps
+# stop a crafted CID that links the same block many times from blowing up
+MAX_FILE_SIZE = 1 << 20
+MAX_BLOCK_VISITS = 4096
+
+
+def _varint(buf: bytes, pos: int) -> tuple:
+    value = shift = 0
+    while True:
+        if pos >= len(buf):
+            raise ValueError("truncated varint")
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _b58decode(text: str) -> bytes:
+    num = 0
+    for char in text:
+        num = num * 58 + _B58_ALPHABET.index(char)
+    body = num.to_bytes((num.bit_length() + 7) // 8, "big")
+    return b"\x00" * (len(text) - len(text.lstrip("1"))) + body
+
+
+def decode_cid(cid: str) -> bytes:
+    """Return the binary form of a CID string (CIDv0 "Qm..." or base32 CIDv1 "b...")."""
+    try:
+        if cid.startswith("Qm") and len(cid) == 46:
+            return _b58decode(cid)
+        if cid.startswith("b"):
+            body = cid[1:].upper()
+            return base64.b32decode(body + "=" * (-len(body) % 8))
+    except ValueError:
+        pass
+    raise ValueError(f"unsupported CID: {cid}")
+
+
+def _read_cid(buf: bytes, pos: int) -> tuple:
+    """Read a binary CID at pos; returns (cid bytes, (codec, hash code, digest), next pos)."""
+    start = pos
+    if buf[pos:pos + 2] == b"\x12\x20":
+        # CIDv0: a bare sha2-256 multihash, implicitly dag-pb
+        end = pos + 34
+        if end > len(buf):
+            raise ValueError("truncated CID")
+        return buf[start:end], (DAG_PB, SHA2_256, buf[pos + 2:end]), end
+    version, pos = _varint(buf, pos)
+    if version != 1:
+        raise ValueError(f"unsupported CID version {version}")
+    codec, pos = _varint(buf, pos)
+    hash_code, pos = _varint(buf, pos)
+    length, pos = _varint(buf, pos)
+    end = pos + length
+    if end > len(buf):
+        raise ValueError("truncated CID")
+    return buf[start:end], (codec, hash_code, buf[pos:end]), end
+
+
+def is_verifiable(cid: str) -> bool:
+    """True if the CID's blocks can be checked here (sha2-256, raw or dag-pb, no path)."""
+    try:
+        binary = decode_cid(cid)
+        _, (codec, hash_code, _), end = _read_cid(binary, 0)
+    except ValueError:
+        return False
+    return end == len(binary) and codec in (RAW, DAG_PB) and hash_code == SHA2_256
+
+
+def parse_car(car: bytes) -> dict:
+    """Split a CARv1 stream into {cid bytes: block bytes} (unverified)."""
+    header_len, pos = _varint(car, 0)
+    pos += header_len  # dag-cbor header (version, roots); the caller already knows the root
+    blocks = {}
+    while pos < len(car):
+        section_len, pos = _varint(car, pos)
+        end = pos + section_len
+        if end > len(car):
+            raise ValueError("truncated CAR section")
+        cid_bytes, _, data_start = _read_cid(car, pos)
+        blocks[cid_bytes] = car[data_start:end]
+        pos = end
+    return blocks
+
+
+def _verified_block(blocks: dict, cid_bytes: bytes) -> tuple:
+    """Return (codec, data) for a block after checking its sha2-256 digest against the CID."""
+    data = blocks.get(cid_bytes)
+    if data is None:
+        raise ValueError("block missing from CAR")
+    _, (codec, hash_code, digest), _ = _read_cid(cid_bytes, 0)
+    if hash_code != SHA2_256 or hashlib.sha256(data).digest() != digest:
+        raise ValueError("block does not match its CID")
+    return codec, data
+
+
+def _pb_fields(buf: bytes) -> list:
+    """Decode a protobuf message into [(field number, value)] (varint and length-delimited only)."""
+    fields = []
+    pos = 0
+    while pos < len(buf):
+        tag, pos = _varint(buf, pos)
+        field, wire_type = tag >> 3, tag & 0x7
+        if wire_type == 0:
+            value, pos = _varint(buf, pos)
+        elif wire_type == 2:
+            length, pos = _varint(buf, pos)
+            if pos + length > len(buf):
+                raise ValueError("truncated protobuf field")
+            value = buf[pos:pos + length]
+            pos += length
+        else:
+            raise ValueError(f"unsupported protobuf wire type {wire_type}")
+        fields.append((field, value))
+    return fields
+
+
+def _pb_bytes(value) -> bytes:
+    if not isinstance(value, bytes):
+        raise ValueError("malformed dag-pb node")
+    return value
+
+
+def _file_bytes(blocks: dict, root: bytes) -> bytes:
+    """Concatenate a UnixFS file's bytes, depth-first in link order."""
+    out = bytearray()
+    stack = [root]
+    visits = 0
+    while stack:
+        visits += 1
+        if visits > MAX_BLOCK_VISITS:
+            raise ValueError("file DAG has too many blocks")
+        codec, data = _verified_block(blocks, stack.pop())
+        if codec == RAW:
+            out += data
+        elif codec == DAG_PB:
+            # PBNode: Data = 1, Links = 2 (PBLink.Hash = 1); UnixFS Data: Type = 1, Data = 2
+            node = _pb_fields(data)
+            unixfs = dict(_pb_fields(_pb_bytes(next((value for field, value in node if field == 1), b""))))
+            if unixfs.get(1) not in (_UNIXFS_RAW, _UNIXFS_FILE):
+                raise ValueError("CID is not a UnixFS file")
+            out += _pb_bytes(unixfs.get(2, b""))
+            links = [_pb_bytes(dict(_pb_fields(_pb_bytes(link))).get(1, b"")) for field, link in node if field == 2]
+            stack.extend(reversed(links))
+        else:
+            raise ValueError(f"unsupported codec 0x{codec:x}")
+        if len(out) > MAX_FILE_SIZE:
+            raise ValueError("file exceeds MAX_FILE_SIZE")
+    return bytes(out)
+
+
+def extract_file(car: bytes, cid: str) -> bytes:
+    """Return the file bytes for cid from a CAR response, verifying every block used."""
+    return _file_bytes(parse_car(car), decode_cid(cid))
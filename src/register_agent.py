@@ -3,6 +3,7 @@
 import os
 from dotenv import load_dotenv
 from agent0_sdk import SDK
+from registry_reader import encode_profile
 
 load_dotenv()
 
@@ -43,12 +44,14 @@ agent.setX402Support(False)
 
 # --- Robot classification metadata (on-chain) ---
 # "category" is a reserved ERC-8004 key per https://best-practices.8004scan.io
-# Custom keys (robot_type, fleet_provider, fleet_domain) are also allowed.
+# and stays separate because search filters on it. The robot's type, fleet
+# provider and fleet domain are always written together, so they are packed
+# into one JSON "robot_profile" value (one storage write instead of three).
+# All entries are passed to register() and written in the minting transaction itself.
+robot_profile = encode_profile({"type": "differential_drive", "provider": "yakrover", "domain": "yakrover.com/finland"})
 agent.setMetadata({
     "category": "robot",
-    "robot_type": "differential_drive",
-    "fleet_provider": "yakrover",
-    "fleet_domain": "yakrover.com/finland",
+    "robot_profile": robot_profile,
 })
 
 # --- Register on-chain + upload to IPFS ---
@@ -65,4 +68,4 @@ reg_file = mined.result
 print(f"\nAgent registered on Ethereum Sepolia!")
 print(f"Agent ID: {reg_file.agentId}")
 print(f"Agent URI: {reg_file.agentURI}")
-print(f"On-chain metadata: category=robot, robot_type=differential_drive, fleet_provider=yakrover, fleet_domain=yakrover.com/finland")
+print(f"On-chain metadata: category=robot, robot_profile={robot_profile}")
@@ -0,0 +1,241 @@
+"""Batched reads from the ERC-8004 Identity Registry.
+
+getMetadata and tokenURI lookups are bundled into Multicall3 aggregate3
+calls so that reading many values costs one eth_call per batch. Chains
+without Multicall3 fall back to JSON-RPC batch requests, and nodes that
+reject batching fall back to one eth_call per read.
+
+get_indexed_metadata reads the same values from the subgraph, so callers
+can skip the chain entirely for keys that are already indexed.
+
+web3, eth_abi and requests are imported on first use, so importing this
+module (e.g. from discover_robot_agent for --help) stays cheap.
+"""
+
+import json
+from functools import cache
+
+# Multicall3 is deployed at the same address on every major chain, including Sepolia
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Call3[]",
+                "name": "calls",
+                "type": "tuple[]",
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Result[]",
+                "name": "returnData",
+                "type": "tuple[]",
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function",
+    }
+]
+
+# Max calls per aggregate3 call / JSON-RPC batch (public nodes commonly cap batches at 100)
+BATCH_SIZE = 100
+
+# getMetadata(uint256,string) calldata is selector + agentId + offset of the string (0x40) + string.
+# Everything except the agentId is constant per key, so it's encoded once instead of per call.
+# Selectors are keccak256(signature)[:4]; tests pin them against web3's encode_abi.
+GET_METADATA_SELECTOR = bytes.fromhex("cb4799f2")  # getMetadata(uint256,string)
+_STRING_OFFSET = (0x40).to_bytes(32, "big")
+TOKEN_URI_SELECTOR = bytes.fromhex("c87b56dd")  # tokenURI(uint256)
+
+_multicall_support = {}
+
+
+@cache
+def shared_session():
+    """Shared keep-alive pool for RPC traffic (web3 provider and JSON-RPC batch posts)."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=Retry(total=2, backoff_factor=0.2))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def use_shared_session(sdk) -> None:
+    """Route the SDK's web3 calls through shared_session() so every eth_call reuses pooled connections."""
+    from web3 import HTTPProvider
+
+    sdk.web3_client.w3.provider = HTTPProvider(sdk.rpcUrl, request_kwargs={"timeout": 10}, session=shared_session())
+
+
+def supports_multicall(sdk) -> bool:
+    """Return True if Multicall3 is deployed on the SDK's chain (probed once per chain)."""
+    chain_id = sdk.web3_client.chain_id
+    if chain_id not in _multicall_support:
+        try:
+            code = sdk.web3_client.w3.eth.get_code(MULTICALL3)
+            _multicall_support[chain_id] = len(code) > 0
+        except Exception:
+            _multicall_support[chain_id] = False
+    return _multicall_support[chain_id]
+
+
+@cache
+def _key_tail(key: str) -> bytes:
+    from eth_abi import encode
+
+    # encode(["string"]) is offset + length + data; keep length + data
+    return _STRING_OFFSET + encode(["string"], [key])[32:]
+
+
+def _metadata_calldata(agent_id: int, key: str) -> bytes:
+    return GET_METADATA_SELECTOR + agent_id.to_bytes(32, "big") + _key_tail(key)
+
+
+def _token_uri_calldata(agent_id: int) -> bytes:
+    return TOKEN_URI_SELECTOR + agent_id.to_bytes(32, "big")
+
+
+def _call_via_multicall(sdk, calldata: list) -> list:
+    registry = sdk.identity_registry
+    multicall = sdk.web3_client.w3.eth.contract(address=MULTICALL3, abi=MULTICALL3_ABI)
+    results = []
+    for start in range(0, len(calldata), BATCH_SIZE):
+        calls = [(registry.address, True, data) for data in calldata[start:start + BATCH_SIZE]]
+        results.extend(data if success else None for success, data in multicall.functions.aggregate3(calls).call())
+    return results
+
+
+def _call_via_rpc_batch(sdk, calldata: list) -> list:
+    registry = sdk.identity_registry
+    results = []
+    for start in range(0, len(calldata), BATCH_SIZE):
+        chunk = calldata[start:start + BATCH_SIZE]
+        batch = [
+            {
+                "jsonrpc": "2.0",
+                "id": i,
+                "method": "eth_call",
+                "params": [{"to": registry.address, "data": "0x" + data.hex()}, "latest"],
+            }
+            for i, data in enumerate(chunk)
+        ]
+        try:
+            resp = shared_session().post(sdk.rpcUrl, json=batch, timeout=10)
+            resp.raise_for_status()
+            replies = {reply["id"]: reply for reply in resp.json()}
+            chunk_results = [_batch_result(replies[i]) for i in range(len(chunk))]
+        except Exception:
+            # Batching unsupported: retry this chunk one call at a time
+            chunk_results = [_call_single(sdk, data) for data in chunk]
+        results.extend(chunk_results)
+    return results
+
+
+def _batch_result(reply: dict) -> bytes | None:
+    # An error on one item fails only that call, like aggregate3's success=False
+    if "error" in reply:
+        return None
+    return bytes.fromhex(reply["result"][2:])
+
+
+def _call_single(sdk, data: bytes) -> bytes | None:
+    from web3.exceptions import ContractLogicError
+
+    # Reverts mark the call failed; transport and RPC errors propagate
+    try:
+        return bytes(sdk.web3_client.w3.eth.call({"to": sdk.identity_registry.address, "data": data}))
+    except ContractLogicError:
+        return None
+
+
+def _call_registry(sdk, calldata: list) -> list:
+    """Run raw registry eth_calls in as few round-trips as possible.
+
+    None marks a call that reverted (or errored inside a batch); an unreachable
+    or failing RPC raises instead of coming back as empty values.
+    """
+    if not calldata:
+        return []
+    if supports_multicall(sdk):
+        try:
+            return _call_via_multicall(sdk, calldata)
+        except Exception:
+            pass
+    return _call_via_rpc_batch(sdk, calldata)
+
+
+def _decode_or(types: list, data: bytes | None, default):
+    from eth_abi import decode
+
+    return decode(types, data)[0] if data else default
+
+
+def read_registry(sdk, pairs: list, token_ids: list = ()) -> tuple:
+    """Read getMetadata for (agent_id, key) pairs and tokenURI for token_ids in one batch.
+
+    Returns ({(agent_id, key): bytes}, {agent_id: uri}).
+    """
+    token_ids = list(token_ids)
+    calldata = [_metadata_calldata(agent_id, key) for agent_id, key in pairs]
+    calldata += [_token_uri_calldata(agent_id) for agent_id in token_ids]
+    results = _call_registry(sdk, calldata)
+    metadata = {pair: _decode_or(["bytes"], data, b"") for pair, data in zip(pairs, results)}
+    uris = {agent_id: _decode_or(["string"], data, "") for agent_id, data in zip(token_ids, results[len(pairs):])}
+    return metadata, uris
+
+
+def get_metadata_batch(sdk, agent_ids: list, keys: tuple) -> dict:
+    """Read getMetadata for every (agent, key) pair in as few round-trips as possible.
+
+    Returns {(agent_id, key): bytes}.
+    """
+    return read_registry(sdk, [(agent_id, key) for agent_id in agent_ids for key in keys])[0]
+
+
+def get_indexed_metadata(sdk, agent_ids: list, keys: tuple) -> dict:
+    """Read metadata values indexed by the subgraph (no RPC calls).
+
+    agent_ids are subgraph ids ("<chainId>:<tokenId>"). Returns
+    {(token_id, key): bytes} for the pairs the subgraph has indexed;
+    unset or not-yet-indexed keys are simply absent.
+    """
+    if sdk.subgraph_client is None or not agent_ids:
+        return {}
+    where = {"agent_in": list(agent_ids), "key_in": list(keys)}
+    values = {}
+    first, skip = 1000, 0
+    while True:
+        rows = sdk.subgraph_client.query_agent_metadatas(where=where, first=first, skip=skip)
+        for row in rows:
+            token_id = int(str((row.get("agent") or {}).get("id", "")).split(":")[-1])
+            value = row.get("value") or "0x"
+            values[(token_id, row["key"])] = bytes.fromhex(value[2:] if value.startswith("0x") else value)
+        if len(rows) < first:
+            break
+        skip += first
+    return values
+
+
+def encode_profile(profile: dict) -> str:
+    """Pack a robot_profile dict into its on-chain value (compact JSON).
+
+    Shared by register_agent.py and update_agent.py so both write identical
+    bytes, and update_agent.py's comparison with the chain stays stable.
+    """
+    return json.dumps(profile, separators=(",", ":"))
@@ -1,9 +1,9 @@
+import asyncio
 import sys
 import os
-
-sys.path.insert(0, os.path.dirname(__file__))
-
+from contextlib import asynccontextmanager
 from typing import Literal
+import orjson
 from dotenv import load_dotenv
 from fastmcp import FastMCP
 from tumbller_client import TumbllerClient
@@ -19,12 +19,33 @@ if bearer_token:
         tokens={bearer_token: {"client_id": "mcp-client", "scopes": []}}
     )
 
+robot = TumbllerClient()
+
+# Overall budget for a liveness probe (DNS + connect + response), in seconds
+ONLINE_CHECK_TIMEOUT = 2.0
+
+
+@asynccontextmanager
+async def lifespan(server):
+    # Close the robot's pooled connections when the server shuts down
+    try:
+        yield
+    finally:
+        await robot.aclose()
+
+
+def serialize_result(data) -> str:
+    """Serialize tool results for the text content block."""
+    return orjson.dumps(data, default=str).decode()
+
+
 mcp = FastMCP(
     name="Tumbller Self-Balancing Robot",
     instructions="Control and monitor a Tumbller ESP32-S3 self-balancing robot",
     auth=auth,
+    lifespan=lifespan,
+    tool_serializer=serialize_result,
 )
-robot = TumbllerClient()
 
 
 @mcp.tool
@@ -39,7 +60,7 @@ async def move(direction: Literal["forward", "back", "left", "right", "stop"]) -
 async def is_robot_online() -> dict:
     """Check if the robot is online and reachable."""
     try:
-        await robot.get("/info")
+        await asyncio.wait_for(robot.get("/info"), timeout=ONLINE_CHECK_TIMEOUT)
         return {"online": True}
     except Exception:
         return {"online": False}
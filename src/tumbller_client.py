@@ -1,16 +1,27 @@
 import httpx
+import orjson
 import os
 
 
 class TumbllerClient:
     def __init__(self):
         self.base_url = os.getenv("TUMBLLER_URL", "http://finland-tumbller-01.local")
-        self.client = httpx.AsyncClient(base_url=self.base_url, timeout=5.0)
+        # One persistent client so tool calls reuse kept-alive connections
+        # instead of opening a new TCP connection to the ESP32 every time.
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            # Fail fast on an unreachable robot: 2 s to connect, 5 s per read/write
+            timeout=httpx.Timeout(5.0, connect=2.0),
+            limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=30),
+        )
 
     async def get(self, path: str) -> dict:
         resp = await self.client.get(path)
         resp.raise_for_status()
         try:
-            return resp.json()
+            return orjson.loads(resp.content)
         except Exception:
             return {"status": "ok", "body": resp.text}
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
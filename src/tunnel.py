@@ -1,7 +1,13 @@
-"""Start an ngrok tunnel to the MCP server using a static free domain."""
+"""Start an ngrok tunnel to the MCP server using a static free domain.
+
+Uses the in-process ngrok SDK (no ngrok agent subprocess to spawn).
+"""
 
 import os
-from pyngrok import ngrok, conf
+import ngrok
+
+# Keep a reference so the listener isn't closed while the server is running
+_listener = None
 
 
 def start_tunnel(port: int = 8000) -> str:
@@ -13,13 +19,9 @@ def start_tunnel(port: int = 8000) -> str:
     if not domain:
         raise RuntimeError("NGROK_DOMAIN not set in .env (claim at https://dashboard.ngrok.com/domains)")
 
-    ngrok.set_auth_token(auth_token)
-    tunnel = ngrok.connect(
-        addr=str(port),
-        proto="http",
-        hostname=domain,
-    )
-    public_url = f"https://{domain}"
+    global _listener
+    _listener = ngrok.forward(port, authtoken=auth_token, domain=domain)
+    public_url = _listener.url()
     print(f"ngrok tunnel: {public_url}")
     print(f"MCP endpoint: {public_url}/mcp")
     return public_url
@@ -1,14 +1,19 @@
 """Update the existing Tumbller agent registration.
 
 Loads agent 11155111:989, ensures MCP tools are set, migrates
-on-chain metadata from agent_type to category (ERC-8004 standard),
+on-chain metadata from agent_type to category (ERC-8004 standard) and
+from robot_type / fleet_provider / fleet_domain to robot_profile,
 re-uploads to IPFS, and updates the on-chain tokenURI.
+
+The SDK can't clear on-chain keys; run fix_metadata.py to empty the
+superseded keys on-chain.
 """
 
 import os
 from dotenv import load_dotenv
 from agent0_sdk import SDK
 from agent0_sdk.core.models import EndpointType
+from registry_reader import encode_profile, get_metadata_batch, use_shared_session
 
 load_dotenv()
 
@@ -19,9 +24,18 @@ sdk = SDK(
     ipfs="pinata",
     pinataJwt=os.environ["PINATA_JWT"],
 )
+use_shared_session(sdk)
 
 AGENT_ID = "11155111:989"
 
+# robot_type / fleet_provider / fleet_domain are packed into one robot_profile value
+ROBOT_METADATA = {
+    "category": "robot",
+    "robot_profile": encode_profile(
+        {"type": "differential_drive", "provider": "yakrover", "domain": "yakrover.com/finland"}
+    ),
+}
+
 print(f"Loading agent {AGENT_ID}...")
 agent = sdk.loadAgent(AGENT_ID)
 
@@ -38,18 +52,24 @@ mcp_ep.meta["mcpTools"] = ["move", "is_robot_online", "get_temperature_humidity"
 
 print(f"\n  Updated tools: {mcp_ep.meta['mcpTools']}")
 
-# Migrate on-chain metadata: agent_type -> category (ERC-8004 reserved key)
-agent.setMetadata({
-    "category": "robot",
-    "robot_type": "differential_drive",
-    "fleet_provider": "yakrover",
-    "fleet_domain": "yakrover.com/finland",
-})
-
-# Delete the old non-standard key
-agent.delMetadata("agent_type")
-
-print("  Metadata: category=robot (migrated from agent_type)")
+# Migrate on-chain metadata: agent_type -> category (ERC-8004 reserved key).
+# Only keys whose on-chain value differs are marked dirty, so unchanged
+# keys don't cost a setMetadata transaction.
+agent_id_int = int(AGENT_ID.split(":")[-1])
+current = get_metadata_batch(sdk, [agent_id_int], tuple(ROBOT_METADATA))
+changed = {k: v for k, v in ROBOT_METADATA.items() if current[(agent_id_int, k)] != v.encode()}
+agent.registration_file.metadata.update(ROBOT_METADATA)  # keep the full set in the IPFS file
+if changed:
+    agent.setMetadata(changed)
+
+# Drop the superseded keys from the registration file
+for key in ("agent_type", "robot_type", "fleet_provider", "fleet_domain"):
+    agent.delMetadata(key)
+
+if changed:
+    print(f"  Metadata: updating {', '.join(changed)}")
+else:
+    print("  Metadata: on-chain values already up to date, skipping metadata writes")
 
 # Re-upload to IPFS and update on-chain URI + metadata
 print("\nSubmitting update transaction...")
@@ -0,0 +1,72 @@
+"""Tests for the IPFS registration cache in discover_robot_agent."""
+
+import asyncio
+import base64
+import hashlib
+
+import httpx
+
+import discover_robot_agent as discover
+
+DOC = b'{"services":[{"name":"MCP","mcpTools":["move"]}]}'
+
+
+def raw_car(data: bytes) -> tuple:
+    """Return (CIDv1 string, single-block CAR) for a raw block."""
+    cid = bytes([0x01, 0x55, 0x12, 0x20]) + hashlib.sha256(data).digest()
+    header = b"\xa2eroots\x80gversion\x01"
+    car = bytes([len(header)]) + header + bytes([len(cid) + len(data)]) + cid + data
+    return "b" + base64.b32encode(cid).decode().lower().rstrip("="), car
+
+
+def test_cache_dir_follows_xdg_cache_home_at_call_time(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    cid, car = raw_car(DOC)
+
+    discover.write_cached(cid, car)
+
+    assert (tmp_path / "tumbller" / "ipfs" / f"{cid}.car").read_bytes() == car
+    assert discover.read_cached(cid) == {"services": [{"name": "MCP", "mcpTools": ["move"]}]}
+
+
+def test_tampered_cache_entry_is_ignored(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    cid, car = raw_car(DOC)
+    discover.write_cached(cid, car.replace(b"move", b"evil"))
+
+    assert discover.read_cached(cid) is None
+
+
+def test_unverifiable_cids_are_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    cid = "QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o/registration.json"
+
+    discover.write_cached(cid, DOC)
+
+    assert not (tmp_path / "tumbller").exists()
+    assert discover.read_cached(cid) is None
+
+
+def test_preferred_gateway_races_with_public_ones(monkeypatch):
+    monkeypatch.setenv("IPFS_GATEWAY", "http://127.0.0.1:8080/ipfs/")
+    monkeypatch.setenv("PINATA_GATEWAY_TOKEN", "secret")
+    cid, car = raw_car(DOC)
+    seen = {}
+
+    async def handler(request):
+        seen[request.url.host] = request.headers.get("x-pinata-gateway-token")
+        if request.url.host == "127.0.0.1":
+            await asyncio.sleep(5)  # hung local node must not delay the race
+        if request.url.host != "dweb.link":
+            return httpx.Response(504)
+        return httpx.Response(200, content=car)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await asyncio.wait_for(discover.race_gateways(client, cid), timeout=1)
+
+    doc, raw = asyncio.run(run())
+
+    assert raw == car and doc["services"][0]["name"] == "MCP"
+    assert seen["127.0.0.1"] == "secret"
+    assert seen["ipfs.io"] is None
@@ -0,0 +1,172 @@
+"""Tests for CAR parsing and CID verification in ipfs_car."""
+
+import base64
+import hashlib
+import random
+
+import pytest
+
+import ipfs_car
+from ipfs_car import decode_cid, extract_file, is_verifiable
+
+# `ipfs add` of "hello world\n" (kubo defaults: CIDv0, dag-pb)
+HELLO_CIDV0 = "QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o"
+
+DOC = b'{"services":[{"name":"MCP","mcpTools":["move","is_robot_online"]}]}'
+
+
+def varint(n: int) -> bytes:
+    out = b""
+    while True:
+        byte, n = n & 0x7F, n >> 7
+        if not n:
+            return out + bytes([byte])
+        out += bytes([byte | 0x80])
+
+
+def pb_bytes(field: int, value: bytes) -> bytes:
+    return varint(field << 3 | 2) + varint(len(value)) + value
+
+
+def cid_v1(codec: int, data: bytes) -> bytes:
+    return bytes([0x01, codec, 0x12, 0x20]) + hashlib.sha256(data).digest()
+
+
+def cid_v0(data: bytes) -> bytes:
+    return b"\x12\x20" + hashlib.sha256(data).digest()
+
+
+def cid_str(cid: bytes) -> str:
+    return "b" + base64.b32encode(cid).decode().lower().rstrip("=")
+
+
+def b58(data: bytes) -> str:
+    num = int.from_bytes(data, "big")
+    text = ""
+    while num:
+        num, rem = divmod(num, 58)
+        text = ipfs_car._B58_ALPHABET[rem] + text
+    return "1" * (len(data) - len(data.lstrip(b"\x00"))) + text
+
+
+def unixfs_node(data: bytes = b"", links: list = (), filesize: int | None = None) -> bytes:
+    unixfs = b"\x08\x02" + (pb_bytes(2, data) if data else b"")
+    unixfs += b"\x18" + varint(len(data) if filesize is None else filesize)
+    # dag-pb canonical order: Links before Data
+    return b"".join(pb_bytes(2, pb_bytes(1, link)) for link in links) + pb_bytes(1, unixfs)
+
+
+def car(*blocks: tuple) -> bytes:
+    header = b"\xa2eroots\x80gversion\x01"  # dag-cbor {"roots": [], "version": 1}
+    out = varint(len(header)) + header
+    for cid, data in blocks:
+        out += varint(len(cid) + len(data)) + cid + data
+    return out
+
+
+def test_raw_leaf_cidv1():
+    cid = cid_v1(ipfs_car.RAW, DOC)
+    assert is_verifiable(cid_str(cid))
+    assert extract_file(car((cid, DOC)), cid_str(cid)) == DOC
+
+
+def test_dag_pb_cidv0_matches_kubo():
+    node = unixfs_node(b"hello world\n")
+    assert b58(cid_v0(node)) == HELLO_CIDV0
+    assert decode_cid(HELLO_CIDV0) == cid_v0(node)
+    assert is_verifiable(HELLO_CIDV0)
+    assert extract_file(car((cid_v0(node), node)), HELLO_CIDV0) == b"hello world\n"
+
+
+def test_multi_block_file():
+    chunks = [DOC[:20], DOC[20:45], DOC[45:]]
+    leaves = [cid_v1(ipfs_car.RAW, chunk) for chunk in chunks]
+    root = unixfs_node(links=leaves, filesize=len(DOC))
+    root_cid = cid_v1(ipfs_car.DAG_PB, root)
+    # Block order in the CAR doesn't matter; link order does
+    blocks = [(root_cid, root)] + list(zip(leaves, chunks))[::-1]
+    assert extract_file(car(*blocks), cid_str(root_cid)) == DOC
+
+
+def test_tampered_block_is_rejected():
+    cid = cid_v1(ipfs_car.RAW, DOC)
+    forged = DOC.replace(b"move", b"evil")
+    with pytest.raises(ValueError, match="does not match"):
+        extract_file(car((cid, forged)), cid_str(cid))
+
+
+def test_tampered_leaf_is_rejected():
+    leaves = [cid_v1(ipfs_car.RAW, DOC[:10]), cid_v1(ipfs_car.RAW, DOC[10:])]
+    root = unixfs_node(links=leaves, filesize=len(DOC))
+    root_cid = cid_v1(ipfs_car.DAG_PB, root)
+    blocks = car((root_cid, root), (leaves[0], DOC[:10]), (leaves[1], DOC[10:] + b" "))
+    with pytest.raises(ValueError, match="does not match"):
+        extract_file(blocks, cid_str(root_cid))
+
+
+def test_missing_block_is_rejected():
+    leaves = [cid_v1(ipfs_car.RAW, DOC[:10]), cid_v1(ipfs_car.RAW, DOC[10:])]
+    root = unixfs_node(links=leaves, filesize=len(DOC))
+    root_cid = cid_v1(ipfs_car.DAG_PB, root)
+    with pytest.raises(ValueError, match="missing"):
+        extract_file(car((root_cid, root), (leaves[0], DOC[:10])), cid_str(root_cid))
+
+
+def test_repeated_links_are_bounded():
+    # Each level links the one below twice: 2**20 visits if walked naively
+    cid, data = cid_v1(ipfs_car.RAW, b"x"), b"x"
+    blocks = [(cid, data)]
+    for _ in range(20):
+        data = unixfs_node(links=[cid, cid], filesize=0)
+        cid = cid_v1(ipfs_car.DAG_PB, data)
+        blocks.append((cid, data))
+    with pytest.raises(ValueError, match="too many blocks"):
+        extract_file(car(*blocks), cid_str(cid))
+
+
+@pytest.mark.parametrize(
+    "cid",
+    [
+        HELLO_CIDV0 + "/registration.json",  # path inside the CID
+        cid_str(cid_v1(0x71, b"{}")),  # dag-cbor
+        cid_str(bytes([0x01, ipfs_car.RAW]) + varint(0xB220) + b"\x20" + bytes(32)),  # blake2b-256
+        "z" + b58(cid_v1(ipfs_car.RAW, DOC)),  # base58btc CIDv1
+        "bafkreinotacid",
+        "",
+    ],
+)
+def test_not_verifiable(cid):
+    assert not is_verifiable(cid)
+
+
+@pytest.mark.parametrize(
+    "blob",
+    [
+        b"",
+        b"\xff\xff\xff",
+        car((cid_v1(ipfs_car.RAW, DOC), DOC))[:-5],
+        car((cid_v1(ipfs_car.RAW, DOC), DOC))[:12],
+        car()[:4],
+        car(),
+    ],
+)
+def test_truncated_or_garbage_car_raises(blob):
+    with pytest.raises(ValueError):
+        extract_file(blob, cid_str(cid_v1(ipfs_car.RAW, DOC)))
+
+
+def test_random_garbage_raises_value_error():
+    rng = random.Random(8004)
+    root = cid_v1(ipfs_car.DAG_PB, b"")
+    for _ in range(500):
+        blob = bytes(rng.randrange(256) for _ in range(rng.randrange(1, 200)))
+        with pytest.raises(ValueError):
+            extract_file(blob, cid_str(root))
+
+
+def test_malformed_dag_pb_node_raises_value_error():
+    # A node whose Data field is a varint instead of bytes
+    node = b"\x08\x05"
+    cid = cid_v1(ipfs_car.DAG_PB, node)
+    with pytest.raises(ValueError):
+        extract_file(car((cid, node)), cid_str(cid))
@@ -0,0 +1,107 @@
+"""Tests for the hand-encoded registry calldata and Multicall3 decoding in registry_reader."""
+
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from agent0_sdk.core.contracts import IDENTITY_REGISTRY_ABI
+from eth_abi import decode, encode
+from web3 import Web3
+from web3.providers import BaseProvider
+
+import discover_robot_agent as discover
+import registry_reader
+
+REGISTRY = "0x8004A818BFB912233c491871b3d84c89A494BD9e"
+
+
+@pytest.fixture
+def registry():
+    return Web3().eth.contract(address=REGISTRY, abi=IDENTITY_REGISTRY_ABI)
+
+
+@pytest.mark.parametrize("agent_id", [0, 1, 989, 2**256 - 1])
+@pytest.mark.parametrize("key", ["category", "robot_profile", "", "k" * 32, "k" * 33, "ключ"])
+def test_metadata_calldata_matches_encode_abi(registry, agent_id, key):
+    expected = registry.encode_abi("getMetadata", args=[agent_id, key])
+    assert "0x" + registry_reader._metadata_calldata(agent_id, key).hex() == expected
+
+
+@pytest.mark.parametrize("agent_id", [0, 989, 2**256 - 1])
+def test_token_uri_calldata_matches_encode_abi(registry, agent_id):
+    expected = registry.encode_abi("tokenURI", args=[agent_id])
+    assert "0x" + registry_reader._token_uri_calldata(agent_id).hex() == expected
+
+
+def test_import_defers_web3_and_requests():
+    code = "import sys, registry_reader; print(*sorted({'web3', 'eth_abi', 'requests'} & set(sys.modules)))"
+    src = Path(registry_reader.__file__).parent
+    out = subprocess.run([sys.executable, "-c", code], cwd=src, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
+
+
+class CannedProvider(BaseProvider):
+    """Answers eth_getCode and eth_call (aggregate3) with fixed results."""
+
+    def __init__(self, aggregate3_result: bytes):
+        super().__init__()
+        self.aggregate3_result = aggregate3_result
+        self.calls = []
+
+    def make_request(self, method, params):
+        if method == "eth_chainId":
+            result = "0xaa36a7"
+        elif method == "eth_getCode":
+            result = "0x6080"
+        elif method == "eth_call":
+            self.calls.append(params[0])
+            result = "0x" + self.aggregate3_result.hex()
+        else:
+            raise NotImplementedError(method)
+        return {"jsonrpc": "2.0", "id": 1, "result": result}
+
+
+def test_read_registry_decodes_aggregate3_results(monkeypatch):
+    monkeypatch.setattr(registry_reader, "_multicall_support", {})
+    returned = [
+        (True, encode(["bytes"], [b"robot"])),
+        (False, b""),  # reverted call
+        (True, encode(["bytes"], [b""])),  # key set to empty bytes
+        (True, encode(["string"], ["ipfs://bafkreiexample"])),
+    ]
+    provider = CannedProvider(encode(["(bool,bytes)[]"], [returned]))
+    w3 = Web3(provider)
+    sdk = SimpleNamespace(
+        web3_client=SimpleNamespace(w3=w3, chain_id=11155111),
+        identity_registry=w3.eth.contract(address=REGISTRY, abi=IDENTITY_REGISTRY_ABI),
+        rpcUrl="http://rpc.invalid",
+    )
+    pairs = [(989, "category"), (989, "robot_profile"), (990, "category")]
+
+    metadata, uris = registry_reader.read_registry(sdk, pairs, [989])
+
+    assert metadata == {(989, "category"): b"robot", (989, "robot_profile"): b"", (990, "category"): b""}
+    assert uris == {989: "ipfs://bafkreiexample"}
+
+    # One aggregate3 eth_call to Multicall3 carrying every registry call in order
+    (call,) = provider.calls
+    assert Web3.to_checksum_address(call["to"]) == registry_reader.MULTICALL3
+    data = bytes.fromhex(call["data"][2:])
+    (calls,) = decode(["(address,bool,bytes)[]"], data[4:])
+    assert [Web3.to_checksum_address(target) for target, _, _ in calls] == [REGISTRY] * 4
+    assert all(allow_failure for _, allow_failure, _ in calls)
+    assert [calldata for _, _, calldata in calls] == [
+        registry_reader._metadata_calldata(989, "category"),
+        registry_reader._metadata_calldata(989, "robot_profile"),
+        registry_reader._metadata_calldata(990, "category"),
+        registry_reader._token_uri_calldata(989),
+    ]
+
+
+def test_encode_profile_is_compact_and_parses_back():
+    profile = {"type": "differential_drive", "provider": "yakrover", "domain": "yakrover.com/finland"}
+    value = registry_reader.encode_profile(profile)
+    assert value == '{"type":"differential_drive","provider":"yakrover","domain":"yakrover.com/finland"}'
+    assert discover.parse_profile(value.encode()) == profile